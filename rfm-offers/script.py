@@ -3,11 +3,76 @@ import csv
 import os
 import sys
 import argparse
-from datetime import datetime
+import time
 import textwrap
 import re
 
+try:
+    import orjson
+except ImportError:
+    # orjson не установлен - используем стандартный json
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    # ijson не установлен - actions.json загружается целиком
+    ijson = None
+
+# Суффиксы displayObject в controlSettings (интернированы, чтобы поиск в индексе сравнивал строки по ссылке)
+_DISCOUNT = sys.intern('discount')
+_COUNT = sys.intern('count')
+_TXTCOST = sys.intern('txtCost')
+
+class ParsedReq:
+    """Разобранная строка требований оффера (поля приведены к нужным типам один раз)"""
+    __slots__ = ('action_id', 'award', 'award_text', 'price', 'discount', 'old_price', 'segments',
+                 'start_norm', 'end_norm', 'techitem_id', 'techitem_count', 'techitem_count_str')
+
+    def __init__(self, action_id, award, award_text, price, discount, old_price, segments,
+                 start_norm, end_norm, techitem_id=None, techitem_count=None, techitem_count_str=''):
+        self.action_id = action_id
+        self.award = award
+        self.award_text = award_text
+        self.price = price
+        self.discount = discount
+        self.old_price = old_price
+        self.segments = segments
+        self.start_norm = start_norm
+        self.end_norm = end_norm
+        self.techitem_id = techitem_id
+        self.techitem_count = techitem_count
+        self.techitem_count_str = techitem_count_str
+
+class Req:
+    """Строка CSV-файла с доступом к значениям по имени колонки через общий индекс заголовка"""
+    __slots__ = ('_row', '_idx')
+
+    def __init__(self, row, idx):
+        self._row = row
+        self._idx = idx
+
+    def get(self, key, default=None):
+        i = self._idx.get(key)
+        if i is None:
+            return default
+        # Как и csv.DictReader, недостающие в короткой строке значения считаем None
+        return self._row[i] if i < len(self._row) else None
+
+    def __getitem__(self, key):
+        i = self._idx[key]
+        return self._row[i] if i < len(self._row) else None
+
+    def __contains__(self, key):
+        return key in self._idx
+
+    def keys(self):
+        return self._idx.keys()
+
 class RfmOffersValidator:
+    # Дата со временем без ведущего нуля в часе: "2025-06-12 7:00:00"
+    _DATE_HOUR_RE = re.compile(r'(\d{4}-\d{2}-\d{2}) (\d):(\d{2}):(\d{2})')
+    
     def __init__(self, requirements_file="requirements.csv", 
                  actions_file="actions.json", rfm_files=None, verbose=True, json_output=False):
         """
@@ -22,9 +87,13 @@ class RfmOffersValidator:
         """
         self.errors = []
         self.warnings = []
+        # Записи лога хранятся кортежами (время, уровень, оффер, сообщение) и форматируются при сохранении.
+        # Цвета добавляются только при выводе в консоль, поэтому в лог ANSI-коды не попадают
         self.info_logs = []
         self.verbose = verbose
         self.json_output = json_output
+        # Строки для консоли копятся в буфере и выводятся одной записью в конце этапа
+        self._stdout_buf = []
         
         # Цвета для вывода
         self.GREEN = "\033[92m"
@@ -54,65 +123,133 @@ class RfmOffersValidator:
         # Если rfm_files не указан, ищем по стандартному шаблону
         if rfm_files is None:
             rfm_files = {}
-            for file in os.listdir():
-                if file.startswith('rfm') and file.endswith('.json'):
-                    offer_name = file.replace('.json', '')
-                    rfm_files[offer_name] = file
-        
-        self.print_header("ВАЛИДАЦИЯ RFM ОФФЕРОВ")
-        self.log_info(f"Файлы для проверки:")
-        self.log_info(f"- Требования: {requirements_file}")
-        self.log_info(f"- Экшены: {actions_file}")
-        for offer_name, file_path in rfm_files.items():
-            self.log_info(f"- {offer_name}: {file_path}")
-        
-        # Загрузка данных
-        self.requirements = self._load_csv(requirements_file)
-        self.actions = self._load_json(actions_file)
-        self.rfm_configs = {}
-        
-        for offer_name, file_path in rfm_files.items():
-            self.rfm_configs[offer_name] = self._load_json(file_path)
-        
-        # Создание словарей для быстрого поиска
-        # Словарь для хранения требований по имени оффера
-        self.requirements_by_offer = {}
-        for req in self.requirements:
-            if 'offer' in req and req['offer']:
-                self.requirements_by_offer[req['offer']] = req
+            with os.scandir('.') as entries:
+                for entry in entries:
+                    file = entry.name
+                    if file.startswith('rfm') and file.endswith('.json') and entry.is_file():
+                        offer_name = file[:-len('.json')]
+                        rfm_files[offer_name] = file
+        
+        # Буфер консоли выводится и при исключении, чтобы сообщения о загрузке не терялись
+        try:
+            self.print_header("ВАЛИДАЦИЯ RFM ОФФЕРОВ")
+            self.log_info(f"Файлы для проверки:")
+            self.log_info(f"- Требования: {requirements_file}")
+            self.log_info(f"- Экшены: {actions_file}")
+            for offer_name, file_path in rfm_files.items():
+                self.log_info(f"- {offer_name}: {file_path}")
+        
+            # Загрузка данных
+            self.requirements = self._load_csv(requirements_file)
+            # Словари экшенов из actions.json по ID: сами экшены, очки в наградах и цена в needResources
+            self.actions_by_id = {}
+            self.action_award_points = {}
+            self.action_cash_price = {}
+            self._load_actions_indexed(actions_file)
+            self.rfm_configs = {}
+        
+            for offer_name, file_path in rfm_files.items():
+                self.rfm_configs[offer_name] = self._load_json(file_path)
+        
+            # Создание словарей для быстрого поиска
+            # Словарь для хранения требований по имени оффера
+            self.requirements_by_offer = {}
+            for req in self.requirements:
+                if 'offer' in req and req['offer']:
+                    self.requirements_by_offer[req['offer']] = req
+        
+            # Разобранные требования по имени оффера (разбор выполняется один раз)
+            self.req_parsed = {}
+            for offer_name, req in self.requirements_by_offer.items():
+                self.req_parsed[offer_name] = self._parse_requirement(req)
 
-        # Словарь для хранения всех экшенов из actions.json
-        self.actions_by_id = {}
-        for action in self.actions:
-            action_id = action.get('@id')
-            if action_id:
-                self.actions_by_id[int(action_id)] = action
-        
-        self.log_info(f"Загружено {len(self.requirements_by_offer)} записей из таблицы требований")
-        self.log_info(f"Загружено {len(self.actions_by_id)} записей из файла экшенов")
-        self.log_info(f"Загружено {len(self.rfm_configs)} RFM-конфигураций")
-        print("")
+            self.log_info(f"Загружено {len(self.requirements_by_offer)} записей из таблицы требований")
+            self.log_info(f"Загружено {len(self.actions_by_id)} записей из файла экшенов")
+            self.log_info(f"Загружено {len(self.rfm_configs)} RFM-конфигураций")
+            self._emit("")
+        finally:
+            self._flush_stdout()
         
     def _load_json(self, file_path):
         """Загрузка JSON-файла"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                self.log_info(f"✓ JSON-файл {file_path} успешно загружен")
-                return data
+            # Файл читается целиком одним вызовом и разбирается из байтов
+            with open(file_path, 'rb') as f:
+                raw = f.read()
+            data = orjson.loads(raw) if orjson is not None else json.loads(raw)
+            self.log_info(f"✓ JSON-файл {file_path} успешно загружен")
+            return data
         except Exception as e:
             error_msg = f"Ошибка при загрузке JSON-файла {file_path}: {str(e)}"
             self.log_error(error_msg)
             return {}
     
+    def _load_actions_indexed(self, file_path):
+        """Загрузка actions.json сразу в словари экшенов по ID (потоково, если установлен ijson)"""
+        if ijson is None:
+            for action in self._load_json(file_path):
+                self._index_action(action)
+            return
+        
+        # _index_action не выбрасывает исключений, поэтому здесь ловятся только ошибки чтения и разбора JSON
+        try:
+            # Экшены разбираются по одному, весь список в памяти не собирается
+            with open(file_path, 'rb', buffering=1024 * 1024) as f:
+                for action in ijson.items(f, 'item', use_float=True):
+                    self._index_action(action)
+            self.log_info(f"✓ JSON-файл {file_path} успешно загружен")
+        except Exception as e:
+            self.actions_by_id.clear()
+            self.action_award_points.clear()
+            self.action_cash_price.clear()
+            error_msg = f"Ошибка при загрузке JSON-файла {file_path}: {str(e)}"
+            self.log_error(error_msg)
+    
+    def _index_action(self, action):
+        """Добавление экшена в словари поиска по ID"""
+        # Некорректный элемент пропускается с предупреждением (одинаково для загрузки через ijson и json)
+        if not isinstance(action, dict):
+            self.log_warning(f"Некорректная запись экшена в actions.json: {action}")
+            return
+        
+        action_id = action.get('@id')
+        if not action_id:
+            return
+        
+        try:
+            action_id = int(action_id)
+        except (ValueError, TypeError):
+            self.log_warning(f"Некорректный @id экшена в actions.json: {action_id}")
+            return
+        self.actions_by_id[action_id] = action
+        self.action_award_points.pop(action_id, None)
+        self.action_cash_price.pop(action_id, None)
+        
+        # Награда типа "item" с itemId, соответствующим очкам (17909 обычно)
+        for award in action.get('awards', []):
+            if award.get('type') == 'item' and award.get('itemId') == 17909:  # ID для очков
+                self.action_award_points[action_id] = award.get('count', 0)
+                break
+        
+        # Цена - ресурс типа "cash" в needResources
+        for resource in action.get('needResources', []):
+            if resource.get('type') == 'cash':
+                self.action_cash_price[action_id] = resource.get('count', 0)
+                break
+    
     def _load_csv(self, file_path):
         """Загрузка CSV-файла"""
         try:
             data = []
-            with open(file_path, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    data.append(row)
+            with open(file_path, 'r', encoding='utf-8', buffering=1024 * 1024) as f:
+                reader = csv.reader(f)
+                header = next(reader, None)
+                if header is not None:
+                    # Позиции колонок вычисляются один раз, строки хранятся кортежами
+                    idx = {name: i for i, name in enumerate(header)}
+                    for row in reader:
+                        if row:
+                            data.append(Req(tuple(row), idx))
             self.log_info(f"✓ CSV-файл {file_path} успешно загружен")
             return data
         except Exception as e:
@@ -120,31 +257,81 @@ class RfmOffersValidator:
             self.log_error(error_msg)
             return []
     
+    def _parse_requirement(self, req):
+        """Разбор строки требований: приведение типов, нормализация дат и поиск колонки техайтема"""
+        # Сегменты храним отсортированным кортежем для сравнения одной операцией
+        segments = tuple(sorted(segment.strip() for segment in req.get('segment', '').split(',') if segment.strip()))
+        
+        # Некорректные числа не прерывают загрузку: вместо них None, проверки оффера сообщат о проблеме
+        parsed = ParsedReq(
+            action_id=self._to_number(req.get('action', 0), int),
+            award=self._to_number(req.get('award', 0), int),
+            award_text=req.get('award', ''),
+            price=self._to_number(req.get('price', 0), float),
+            discount=req.get('discount', ''),
+            old_price=req.get('old_price', ''),
+            segments=segments,
+            start_norm=self._normalize_date_format(req.get('start', '')),
+            end_norm=self._normalize_date_format(req.get('end', ''))
+        )
+        
+        # Ищем колонку с техайтемом в формате "techitem(ID)"
+        # - ID техайтема извлекается из названия колонки "techitem(17908)" -> 17908
+        # - В колонке указано ожидаемое количество техайтема
+        for column_name in req.keys():
+            if column_name.startswith('techitem(') and column_name.endswith(')'):
+                match = re.search(r'techitem\((\d+)\)', column_name)
+                if match:
+                    parsed.techitem_id = int(match.group(1))
+                
+                # Очищаем count от возможных символов процентов
+                parsed.techitem_count_str = (req.get(column_name) or '').rstrip('%')
+                try:
+                    parsed.techitem_count = int(parsed.techitem_count_str)
+                except ValueError:
+                    parsed.techitem_count = None
+                break
+        
+        return parsed
+    
+    def _to_number(self, value, cast):
+        """Приведение значения из требований к числу (int или float), None если значение некорректно"""
+        try:
+            return cast(value)
+        except (ValueError, TypeError):
+            return None
+    
     def print_header(self, text):
         """Печать заголовка с форматированием"""
         # Добавляем заголовок в лог
-        log_entry = f"\n{'=' * 80}\n{text}\n{'=' * 80}"
-        self.info_logs.append(log_entry)
+        self.info_logs.append((None, None, None, f"\n{'=' * 80}\n{text}\n{'=' * 80}"))
         
         if self.json_output:
             return
             
-        print("\n" + "=" * 80)
-        print(f"{self.BOLD}{self.MAGENTA}{text}{self.RESET}")
-        print("=" * 80)
+        self._emit("\n" + "=" * 80)
+        self._emit(f"{self.BOLD}{self.MAGENTA}{text}{self.RESET}")
+        self._emit("=" * 80)
+    
+    def _emit(self, line):
+        """Добавление строки в буфер вывода в консоль"""
+        self._stdout_buf.append(line + "\n")
+    
+    def _flush_stdout(self):
+        """Вывод накопленных строк в консоль одной записью"""
+        if self._stdout_buf:
+            sys.stdout.write("".join(self._stdout_buf))
+            self._stdout_buf.clear()
     
     def log_info(self, message):
         """Логирование информационных сообщений"""
-        timestamp = datetime.now().strftime('%H:%M:%S')
-        log_entry = f"[INFO] {timestamp} - {message}"
-        self.info_logs.append(log_entry)
+        self.info_logs.append((time.time(), "INFO", None, message))
         if self.verbose and not self.json_output:
-            print(f"{self.BLUE}[ИНФО]{self.RESET} {message}")
+            self._emit(f"{self.BLUE}[ИНФО]{self.RESET} {message}")
             
     def log_check(self, offer_name, check_name, result, expected=None, actual=None, details=None, check_tag=None):
         """Логирование результата проверки"""
         self.stats["total_checks"] += 1
-        timestamp = datetime.now().strftime('%H:%M:%S')
         
         # Формируем дополнительную информацию для лога
         extra_info = ""
@@ -154,11 +341,11 @@ class RfmOffersValidator:
         if result:
             self.stats["passed_checks"] += 1
             status = f"{self.GREEN}✓ УСПЕХ{self.RESET}"
-            log_msg = f"[CHECK:OK] {timestamp} - {offer_name}: {check_name}{extra_info}"
+            log_level = "CHECK:OK"
         else:
             self.stats["failed_checks"] += 1
             status = f"{self.RED}✗ ОШИБКА{self.RESET}"
-            log_msg = f"[CHECK:FAIL] {timestamp} - {offer_name}: {check_name}{extra_info}"
+            log_level = "CHECK:FAIL"
             
             # Добавляем ошибку в список ошибок для этого offer_name
             if offer_name not in self.offer_errors:
@@ -181,20 +368,18 @@ class RfmOffersValidator:
                 error_msg += f" - {details}"
             self.errors.append(error_msg)
         
-        self.info_logs.append(log_msg)
+        self.info_logs.append((time.time(), log_level, offer_name, f"{check_name}{extra_info}"))
         
         if self.verbose and not self.json_output:
-            print(f"{status} {offer_name}: {check_name}{extra_info}")
+            self._emit(f"{status} {offer_name}: {check_name}{extra_info}")
             if details and not result:
-                print(f"  {details}")
+                self._emit(f"  {details}")
     
     def log_warning(self, message, offer_name=None):
         """Логирование предупреждений"""
         self.stats["warning_checks"] += 1
-        timestamp = datetime.now().strftime('%H:%M:%S')
         
         if offer_name is not None:
-            log_msg = f"[WARNING] {timestamp} - {offer_name}: {message}"
             display_msg = f"{self.YELLOW}[ВНИМАНИЕ]{self.RESET} {offer_name}: {message}"
             
             # Добавляем предупреждение в список для этого offer_name
@@ -209,21 +394,17 @@ class RfmOffersValidator:
                 "tag": "WARNING"
             })
         else:
-            log_msg = f"[WARNING] {timestamp} - {message}"
             display_msg = f"{self.YELLOW}[ВНИМАНИЕ]{self.RESET} {message}"
         
-        self.info_logs.append(log_msg)
+        self.info_logs.append((time.time(), "WARNING", offer_name, message))
         self.warnings.append(message)
         
         if self.verbose and not self.json_output:
-            print(display_msg)
+            self._emit(display_msg)
     
     def log_error(self, message, offer_name=None):
         """Логирование ошибок"""
-        timestamp = datetime.now().strftime('%H:%M:%S')
-        
         if offer_name is not None:
-            log_msg = f"[ERROR] {timestamp} - {offer_name}: {message}"
             display_msg = f"{self.RED}[ОШИБКА]{self.RESET} {offer_name}: {message}"
             
             # Добавляем ошибку в список для этого offer_name
@@ -238,14 +419,13 @@ class RfmOffersValidator:
                 "tag": "ERROR"
             })
         else:
-            log_msg = f"[ERROR] {timestamp} - {message}"
             display_msg = f"{self.RED}[ОШИБКА]{self.RESET} {message}"
         
-        self.info_logs.append(log_msg)
+        self.info_logs.append((time.time(), "ERROR", offer_name, message))
         self.errors.append(message)
         
         if self.verbose and not self.json_output:
-            print(display_msg)
+            self._emit(display_msg)
     
     def start_phase(self, phase_name):
         """Начало новой фазы проверки"""
@@ -254,24 +434,34 @@ class RfmOffersValidator:
     
     def validate_all(self):
         """Запуск всех проверок"""
-        # Фаза 1: Проверка наличия Action ID из требований в actions.json
-        self.validate_action_ids_in_actions()
-        
-        # Фаза 2: Проверка наград и необходимых ресурсов в экшенах
-        self.validate_action_rewards_and_resources()
-        
-        # Фаза 3: Проверка соответствия RFM файлов требованиям
-        self.validate_rfm_files()
-        
-        # Вывод итогового отчёта
-        self.print_summary()
+        # Если фаза прервется исключением, накопленный вывод все равно попадет в консоль
+        try:
+            # Фаза 1: Проверка наличия Action ID из требований в actions.json
+            self.validate_action_ids_in_actions()
+            
+            # Фаза 2: Проверка наград и необходимых ресурсов в экшенах
+            self.validate_action_rewards_and_resources()
+            
+            # Фаза 3: Проверка соответствия RFM файлов требованиям
+            self.validate_rfm_files()
+            
+            # Вывод итогового отчёта
+            self.print_summary()
+        finally:
+            self._flush_stdout()
         
     def validate_action_ids_in_actions(self):
         """Проверка наличия указанных Action ID из требований в actions.json"""
         self.start_phase("ПРОВЕРКА НАЛИЧИЯ ACTION ID В ACTIONS.JSON")
         
-        for offer_name, req in self.requirements_by_offer.items():
-            action_id = int(req.get('action', 0))
+        for offer_name, parsed in self.req_parsed.items():
+            action_id = parsed.action_id
+            if action_id is None:
+                self.log_warning(
+                    f"Некорректный Action ID в требованиях: {self.requirements_by_offer[offer_name].get('action')}",
+                    offer_name
+                )
+                continue
             exists = action_id in self.actions_by_id
             
             self.log_check(
@@ -283,57 +473,54 @@ class RfmOffersValidator:
                 None,
                 "ACTION_EXISTS"
             )
-            
+        
+        self._flush_stdout()
+    
     def validate_action_rewards_and_resources(self):
         """Проверка наград и необходимых ресурсов в экшенах"""
         self.start_phase("ПРОВЕРКА НАГРАД И НЕОБХОДИМЫХ РЕСУРСОВ В ЭКШЕНАХ")
         
-        for offer_name, req in self.requirements_by_offer.items():
-            action_id = int(req.get('action', 0))
+        for offer_name, parsed in self.req_parsed.items():
+            action_id = parsed.action_id
+            if action_id is None:
+                # Некорректный Action ID уже отмечен в фазе 1
+                continue
             
             # Пропускаем проверку, если экшена нет в actions.json
             if action_id not in self.actions_by_id:
                 self.log_warning(f"Пропуск проверки наград для отсутствующего экшена {action_id}", offer_name)
                 continue
             
-            action = self.actions_by_id[action_id]
-            
-            # 1. Проверка наград (количество очков)
-            awards = action.get('awards', [])
-            expected_award = int(req.get('award', 0))
-            expected_tech_item = int(req.get('techitem', 0))
-            
-            # Ищем награду типа "item" с itemId, соответствующим очкам (17909 обычно)
-            award_found = False
-            actual_award = 0
-            
-            for award in awards:
-                if award.get('type') == 'item' and award.get('itemId') == 17909:  # ID для очков
-                    award_found = True
-                    actual_award = award.get('count', 0)
-                    break
-            
-            self.log_check(
-                offer_name,
-                f"Количество очков в награде экшена {action_id}",
-                award_found and actual_award == expected_award,
-                expected_award,
-                actual_award if award_found else "Не найдено",
-                None,
-                "AWARD_POINTS_CHECK"
-            )
+            # 1. Проверка наград (количество очков, найдено при индексации экшенов)
+            expected_award = parsed.award
+            if expected_award is None:
+                self.log_warning(f"Некорректное количество очков в требованиях: {parsed.award_text}", offer_name)
+            else:
+                actual_award = self.action_award_points.get(action_id)
+                award_found = actual_award is not None
+                
+                self.log_check(
+                    offer_name,
+                    f"Количество очков в награде экшена {action_id}",
+                    award_found and actual_award == expected_award,
+                    expected_award,
+                    actual_award if award_found else "Не найдено",
+                    None,
+                    "AWARD_POINTS_CHECK"
+                )
             
             # 2. Проверка необходимых ресурсов (цена)
-            need_resources = action.get('needResources', [])
-            expected_price = float(req.get('price', 0))
-            actual_price = 0
-            price_found = False
-            
-            for resource in need_resources:
-                if resource.get('type') == 'cash':
-                    price_found = True
-                    actual_price = float(resource.get('count', 0))
-                    break
+            expected_price = parsed.price
+            if expected_price is None:
+                self.log_warning(
+                    f"Некорректная цена в требованиях: {self.requirements_by_offer[offer_name].get('price')}",
+                    offer_name
+                )
+                continue
+            actual_price = self.action_cash_price.get(action_id)
+            price_found = actual_price is not None
+            if price_found:
+                actual_price = float(actual_price)
             
             self.log_check(
                 offer_name,
@@ -344,48 +531,31 @@ class RfmOffersValidator:
                 None,
                 "PRICE_CHECK"
             )
+        
+        self._flush_stdout()
     
     def _normalize_date_format(self, date_str):
         """Нормализация формата даты для сравнения"""
         if not date_str:
             return ""
         
+        # Час из одной цифры возможен, только если двоеточие стоит сразу после него (позиция 12)
+        if len(date_str) < 18 or date_str[12] != ':':
+            return date_str
+        
         # Заменяем формат без ведущего нуля (7:00:00) на формат с ведущим нулем (07:00:00)
-        hour_pattern = r'(\d{4}-\d{2}-\d{2}) (\d):(\d{2}):(\d{2})'
-        match = re.match(hour_pattern, date_str)
+        match = self._DATE_HOUR_RE.match(date_str)
         if match:
             date_part, hour, minute, second = match.groups()
             return f"{date_part} {hour.zfill(2)}:{minute}:{second}"
         
         return date_str
         
-    def _find_hasItems_in_dict(self, d):
-        """Рекурсивный поиск hasItems в словаре"""
-        if not isinstance(d, dict):
-            return None
-            
-        if "hasItems" in d:
-            return d["hasItems"]
-            
-        for k, v in d.items():
-            if isinstance(v, dict):
-                result = self._find_hasItems_in_dict(v)
-                if result:
-                    return result
-            elif isinstance(v, list):
-                for item in v:
-                    if isinstance(item, dict):
-                        result = self._find_hasItems_in_dict(item)
-                        if result:
-                            return result
-        
-        return None
-
     def validate_rfm_files(self):
         """Проверка соответствия RFM файлов требованиям"""
         self.start_phase("ПРОВЕРКА СООТВЕТСТВИЯ RFM ФАЙЛОВ ТРЕБОВАНИЯМ")
         
-        for offer_name, req in self.requirements_by_offer.items():
+        for offer_name, parsed in self.req_parsed.items():
             # Проверяем, есть ли конфигурация для этого оффера
             if offer_name not in self.rfm_configs:
                 self.log_warning(f"Файл конфигурации не найден для оффера {offer_name}", offer_name)
@@ -394,7 +564,7 @@ class RfmOffersValidator:
             rfm_config = self.rfm_configs[offer_name]
             
             # 1. Проверка Award ID в массиве awards
-            expected_action_id = int(req.get('action', 0))
+            expected_action_id = parsed.action_id
             awards_array = rfm_config.get('awards', [])
             action_in_awards = expected_action_id in awards_array
             
@@ -409,8 +579,8 @@ class RfmOffersValidator:
             )
             
             # 2. Проверка дат начала и окончания с нормализацией форматов
-            expected_start = self._normalize_date_format(req.get('start', ''))
-            expected_end = self._normalize_date_format(req.get('end', ''))
+            expected_start = parsed.start_norm
+            expected_end = parsed.end_norm
             actual_start = self._normalize_date_format(rfm_config.get('from', ''))
             actual_end = self._normalize_date_format(rfm_config.get('to', ''))
             
@@ -437,16 +607,18 @@ class RfmOffersValidator:
             # 3. Проверка параметров в controlSettings
             control_settings = rfm_config.get('parameters', {}).get('controlSettings', [])
             
-            # 3.1 Проверка скидки
-            expected_discount = f"-{req.get('discount', '')}%"
-            discount_found = False
-            actual_discount = ""
-            
+            # Индексируем controlSettings по суффиксу displayObject за один проход
+            cs_by_suffix = {}
             for setting in control_settings:
-                if setting.get('displayObject', '').endswith('/discount'):
-                    discount_found = True
-                    actual_discount = setting.get('textKeyFit', '')
-                    break
+                _, sep, suffix = setting.get('displayObject', '').rpartition('/')
+                if sep:
+                    cs_by_suffix.setdefault(sys.intern(suffix), setting)
+            
+            # 3.1 Проверка скидки
+            expected_discount = f"-{parsed.discount}%"
+            setting = cs_by_suffix.get(_DISCOUNT)
+            discount_found = setting is not None
+            actual_discount = setting.get('textKeyFit', '') if discount_found else ""
             
             self.log_check(
                 offer_name,
@@ -459,15 +631,10 @@ class RfmOffersValidator:
             )
             
             # 3.2 Проверка количества очков
-            expected_award_text = f"x{req.get('award', '')}"
-            count_found = False
-            actual_count = ""
-            
-            for setting in control_settings:
-                if setting.get('displayObject', '').endswith('/count'):
-                    count_found = True
-                    actual_count = setting.get('textKeyFit', '')
-                    break
+            expected_award_text = f"x{parsed.award_text}"
+            setting = cs_by_suffix.get(_COUNT)
+            count_found = setting is not None
+            actual_count = setting.get('textKeyFit', '') if count_found else ""
             
             self.log_check(
                 offer_name,
@@ -480,15 +647,10 @@ class RfmOffersValidator:
             )
             
             # 3.3 Проверка старой цены
-            expected_old_price = req.get('old_price', '')
-            price_found = False
-            actual_old_price = ""
-            
-            for setting in control_settings:
-                if setting.get('displayObject', '').endswith('/txtCost'):
-                    price_found = True
-                    actual_old_price = setting.get('textKeyFit', '')
-                    break
+            expected_old_price = parsed.old_price
+            setting = cs_by_suffix.get(_TXTCOST)
+            price_found = setting is not None
+            actual_old_price = setting.get('textKeyFit', '') if price_found else ""
             
             self.log_check(
                 offer_name,
@@ -501,24 +663,25 @@ class RfmOffersValidator:
             )
             
             # 4. Проверка сегментов
-            expected_segments = req.get('segment', '').split(',')
-            expected_segments = [segment.strip() for segment in expected_segments if segment.strip()]
+            expected_segments = parsed.segments
             
+            # Индексируем settingsByConditions по имени условия за один проход
             settings_by_conditions = rfm_config.get('parameters', {}).get('settingsByConditions', [])
-            segment_condition_found = False
-            actual_segments = []
-            
+            conds_index = {}
             for condition_setting in settings_by_conditions:
                 conditions = condition_setting.get('conditions', {})
-                if 'isNotInOneOfRFM30Segments' in conditions:
-                    segment_condition_found = True
-                    actual_segments = conditions['isNotInOneOfRFM30Segments'].split(',')
-                    actual_segments = [segment.strip() for segment in actual_segments if segment.strip()]
-                    break
+                for condition_name in ('isNotInOneOfRFM30Segments', 'hasItems'):
+                    if condition_name in conditions:
+                        conds_index.setdefault(condition_name, []).append(conditions)
             
-            # Сортируем для корректного сравнения
-            expected_segments.sort()
-            actual_segments.sort()
+            segment_conditions = conds_index.get('isNotInOneOfRFM30Segments')
+            segment_condition_found = segment_conditions is not None
+            actual_segments = ()
+            
+            # Сортируем для корректного сравнения (ожидаемые сегменты отсортированы при разборе)
+            if segment_condition_found:
+                actual_segments = segment_conditions[0]['isNotInOneOfRFM30Segments'].split(',')
+                actual_segments = tuple(sorted(segment.strip() for segment in actual_segments if segment.strip()))
             
             self.log_check(
                 offer_name,
@@ -530,56 +693,34 @@ class RfmOffersValidator:
                 "SEGMENTS_CHECK"
             )
             
-            # 5. ПРОВЕРКА ТЕХАЙТЕМА: 
-            # - ID техайтема извлекается из названия колонки "techitem(17908)" -> 17908
-            # - В колонке указано ожидаемое количество техайтема
-            
-            # Ищем колонку с техайтемом в формате "techitem(ID)"
-            techitem_column = None
-            techitem_id = None
-            
-            for column_name in req.keys():
-                if column_name.startswith('techitem(') and column_name.endswith(')'):
-                    techitem_column = column_name
-                    # Извлекаем ID из названия колонки
-                    match = re.search(r'techitem\((\d+)\)', column_name)
-                    if match:
-                        techitem_id = int(match.group(1))
-                    break
-            
-            if techitem_column and techitem_id:
-                # Получаем требуемое количество техайтема из колонки
-                techitem_count_str = req.get(techitem_column, '')
-                
-                # Очищаем count от возможных символов процентов
-                if techitem_count_str:
-                    techitem_count_str = techitem_count_str.rstrip('%')
-                    
-                    try:
-                        expected_count = int(techitem_count_str)
+            # 5. ПРОВЕРКА ТЕХАЙТЕМА (колонка "techitem(ID)" разобрана в _parse_requirement)
+            techitem_id = parsed.techitem_id
+            
+            if techitem_id:
+                if parsed.techitem_count_str:
+                    if parsed.techitem_count is not None:
+                        expected_count = parsed.techitem_count
                         
                         # Ищем техайтем в settingsByConditions
                         techitem_found = False
                         actual_count = None
                         actual_id = None
                         
-                        for condition_setting in settings_by_conditions:
-                            conditions = condition_setting.get('conditions', {})
-                            if 'hasItems' in conditions:
-                                has_items = conditions['hasItems']
-                                # Проверяем все техайтемы, найденные в hasItems
-                                for item in has_items:
-                                    if 'itemID' in item:
-                                        if item.get('itemID') == techitem_id:
-                                            techitem_found = True
-                                            actual_count = item.get('count')
-                                            actual_id = item.get('itemID')
-                                            break
-                                        else:
-                                            # Если не совпадает с ожидаемым ID, запоминаем для отчета
-                                            actual_id = item.get('itemID')
-                                if techitem_found:
-                                    break
+                        for conditions in conds_index.get('hasItems', []):
+                            has_items = conditions['hasItems']
+                            # Проверяем все техайтемы, найденные в hasItems
+                            for item in has_items:
+                                if 'itemID' in item:
+                                    if item.get('itemID') == techitem_id:
+                                        techitem_found = True
+                                        actual_count = item.get('count')
+                                        actual_id = item.get('itemID')
+                                        break
+                                    else:
+                                        # Если не совпадает с ожидаемым ID, запоминаем для отчета
+                                        actual_id = item.get('itemID')
+                            if techitem_found:
+                                break
                         
                         # Проверка наличия техайтема с правильным ID
                         self.log_check(
@@ -606,10 +747,12 @@ class RfmOffersValidator:
                         elif techitem_found:
                             self.log_warning(f"Техайтем {techitem_id} найден в hasItems, но без указания количества", offer_name)
                         
-                    except ValueError:
-                        self.log_warning(f"Некорректный формат количества техайтема: {techitem_count_str}", offer_name)
+                    else:
+                        self.log_warning(f"Некорректный формат количества техайтема: {parsed.techitem_count_str}", offer_name)
             else:
                 self.log_info(f"Колонка с техайтемом не найдена в требованиях для оффера {offer_name}")
+        
+        self._flush_stdout()
     
     def print_summary(self):
         """Печать итогового отчета"""
@@ -635,44 +778,54 @@ class RfmOffersValidator:
         if failed > 0:
             self.print_header("СПИСОК ОШИБОК")
             for i, error in enumerate(self.errors, 1):
-                print(f"{i}. {error}")
+                self._emit(f"{i}. {error}")
+        
+        self._flush_stdout()
     
     def save_report_to_csv(self, output_file="validation_report.csv"):
         """Сохранение отчета в CSV-файл"""
         try:
-            with open(output_file, 'w', newline='', encoding='utf-8') as f:
+            rows = [
+                [
+                    offer_name,
+                    error.get("check", ""),
+                    "ОШИБКА" if error.get("tag") != "WARNING" else "ПРЕДУПРЕЖДЕНИЕ",
+                    error.get("expected", ""),
+                    error.get("actual", ""),
+                    error.get("details", "")
+                ]
+                for offer_name, errors in self.offer_errors.items()
+                for error in errors
+            ]
+            
+            with open(output_file, 'w', newline='', encoding='utf-8', buffering=1024 * 1024) as f:
                 writer = csv.writer(f)
                 writer.writerow(["Оффер", "Проверка", "Результат", "Ожидаемое", "Фактическое", "Детали"])
-                
-                for offer_name, errors in self.offer_errors.items():
-                    for error in errors:
-                        writer.writerow([
-                            offer_name,
-                            error.get("check", ""),
-                            "ОШИБКА" if error.get("tag") != "WARNING" else "ПРЕДУПРЕЖДЕНИЕ",
-                            error.get("expected", ""),
-                            error.get("actual", ""),
-                            error.get("details", "")
-                        ])
+                writer.writerows(rows)
                         
             self.log_info(f"Отчет сохранен в файл: {output_file}")
         except Exception as e:
             self.log_error(f"Ошибка при сохранении отчета: {str(e)}")
+        
+        self._flush_stdout()
     
     def save_detailed_log(self, output_file="validation_detailed.log"):
         """Сохранение подробного лога в файл"""
         try:
             with open(output_file, 'w', encoding='utf-8') as f:
-                for line in self.info_logs:
-                    # Удаление ANSI-кодов цветов
-                    clean_line = line
-                    for color_code in [self.GREEN, self.RED, self.YELLOW, self.BLUE, 
-                                      self.MAGENTA, self.CYAN, self.BOLD, self.UNDERLINE, self.RESET]:
-                        clean_line = clean_line.replace(color_code, "")
-                    f.write(clean_line + "\n")
+                for ts, level, offer_name, message in self.info_logs:
+                    if level is None:
+                        line = message
+                    else:
+                        timestamp = time.strftime('%H:%M:%S', time.localtime(ts))
+                        prefix = f"{offer_name}: " if offer_name is not None else ""
+                        line = f"[{level}] {timestamp} - {prefix}{message}"
+                    f.write(line + "\n")
             self.log_info(f"Подробный лог сохранен в файл: {output_file}")
         except Exception as e:
             self.log_error(f"Ошибка при сохранении лога: {str(e)}")
+        
+        self._flush_stdout()
 
 def main():
     parser = argparse.ArgumentParser(description='Валидатор RFM офферов')
@@ -2,13 +2,43 @@ import json
 import csv
 import os
 import sys
-import argparse
-from datetime import datetime
-import textwrap
+import time
+from itertools import chain
+from collections import defaultdict, namedtuple
+from types import SimpleNamespace
+
+try:
+    import orjson
+except ImportError:
+    # orjson не установлен - используем стандартный json
+    orjson = None
+
+# Запись об ошибке или предупреждении для сводной таблицы
+ErrorRecord = namedtuple('ErrorRecord', 'check expected actual details tag')
+
+def _csv_field(value):
+    """Ячейка CSV в том же виде, что пишет csv.writer (кавычки только при необходимости)"""
+    if value is None:
+        return ""
+    text = value if isinstance(value, str) else str(value)
+    if ',' in text or '"' in text or '\n' in text or '\r' in text:
+        return '"' + text.replace('"', '""') + '"'
+    return text
 
 class ShopOffersValidator:
+    # Фиксированный набор атрибутов: доступ через слоты вместо словаря экземпляра
+    __slots__ = ('errors', 'warnings', 'info_logs', 'verbose', 'json_output', '_retain_logs', '_add_log', '_log_fp',
+                 'special_aliases', '_skip_promo_aliases', '_skip_offer_aliases',
+                 'GREEN', 'RED', 'YELLOW', 'BLUE', 'MAGENTA', 'CYAN', 'BOLD', 'UNDERLINE', 'RESET',
+                 '_info_prefix', '_warning_prefix', '_error_prefix', '_check_ok', '_check_fail',
+                 'stats', 'current_phase', 'offer_errors',
+                 'promo', 'requirements', 'actions', 'offers',
+                 'requirements_by_action_id', '_award_cols', '_need_cols', '_award_items_per_req', '_need_items_per_req',
+                 'offers_by_id', '_prices_by_id', 'actions_by_id', 'promo_action_ids')
+
     def __init__(self, promo_file="promo.json", requirements_file="requirements.csv", 
-                 actions_file="actions.json", offers_file="offers.json", verbose=True, json_output=False):
+                 actions_file="actions.json", offers_file="offers.json", verbose=True, json_output=False,
+                 retain_logs=True, log_file=None):
         """
         Инициализация валидатора конфигурации офферов магазина.
         
@@ -19,12 +49,22 @@ class ShopOffersValidator:
             offers_file (str): Путь к JSON-файлу с офферами
             verbose (bool): Подробное логирование
             json_output (bool): Вывод в формате JSON (отключает текстовый вывод)
+            retain_logs (bool): Накапливать записи для подробного лога (нужно для save_detailed_log)
+            log_file (str): Путь к файлу подробного лога; если указан, записи пишутся в файл
+                по мере появления, а не накапливаются в памяти. Файл открывается (и прежнее содержимое
+                стирается) уже при создании валидатора, до начала проверок
         """
         self.errors = []
         self.warnings = []
+        # Записи лога хранятся кортежами (время, уровень, action_id, сообщение) и форматируются при сохранении.
+        # Цвета добавляются только при выводе в консоль, поэтому сообщения в логе не содержат ANSI-кодов
         self.info_logs = []
         self.verbose = verbose
         self.json_output = json_output
+        self._retain_logs = retain_logs
+        # Куда добавляются записи лога: список в памяти или файл при потоковой записи
+        self._add_log = self.info_logs.append
+        self._log_fp = None
         
         # Алиасы с особыми правилами проверки
         self.special_aliases = {
@@ -33,6 +73,13 @@ class ShopOffersValidator:
                 "skip_offer_check": True   # Не проверять наличие Offer ID
             }
         }
+        # Множества алиасов для каждого правила пропуска
+        self._skip_promo_aliases = frozenset(
+            alias for alias, config in self.special_aliases.items() if config.get("skip_promo_check")
+        )
+        self._skip_offer_aliases = frozenset(
+            alias for alias, config in self.special_aliases.items() if config.get("skip_offer_check")
+        )
         
         # Цвета для вывода
         self.GREEN = "\033[92m"
@@ -45,6 +92,18 @@ class ShopOffersValidator:
         self.UNDERLINE = "\033[4m"
         self.RESET = "\033[0m"
         
+        # Если вывод идет не в терминал, цвета не нужны
+        if not sys.stdout.isatty() or json_output:
+            self.GREEN = self.RED = self.YELLOW = self.BLUE = self.MAGENTA = ""
+            self.CYAN = self.BOLD = self.UNDERLINE = self.RESET = ""
+        
+        # Готовые цветные префиксы сообщений для каждого уровня
+        self._info_prefix = f"{self.BLUE}[ИНФО]{self.RESET} "
+        self._warning_prefix = f"{self.YELLOW}[ВНИМАНИЕ]{self.RESET} "
+        self._error_prefix = f"{self.RED}[ОШИБКА]{self.RESET} "
+        self._check_ok = f"{self.GREEN}✓ УСПЕХ{self.RESET} Action "
+        self._check_fail = f"{self.RED}✗ ОШИБКА{self.RESET} Action "
+        
         # Статистика по проверкам
         self.stats = {
             "total_checks": 0,
@@ -57,7 +116,16 @@ class ShopOffersValidator:
         self.current_phase = ""
         
         # Ошибки для сводной таблицы
-        self.offer_errors = {}
+        self.offer_errors = defaultdict(list)
+        
+        # Потоковая запись подробного лога
+        if log_file and retain_logs:
+            try:
+                self._log_fp = open(log_file, 'w', encoding='utf-8', buffering=1024 * 1024)
+                self._add_log = self._write_log
+            except OSError:
+                # Не удалось открыть файл - накапливаем лог в памяти, ошибка будет выведена в save_detailed_log
+                self._log_fp = None
         
         self.print_header("ВАЛИДАЦИЯ ОФФЕРОВ МАГАЗИНА")
         self.log_info(f"Файлы для проверки:")
@@ -82,35 +150,67 @@ class ShopOffersValidator:
                     self.requirements_by_action_id[action_id] = req
                 except (ValueError, TypeError):
                     self.log_warning(f"Некорректный Action ID в требованиях: {req.get('Action')}")
+        
+        # Разобранные названия колонок наград и ресурсов: {колонка: (тип, item_id)} или None при неверном формате
+        self._award_cols = {}
+        self._need_cols = {}
+        for req in self.requirements:
+            for column in req:
+                if column.startswith('Award_') and column not in self._award_cols:
+                    self._award_cols[column] = self._parse_item_column(column, 'Award_')
+                elif column.startswith('NeedResources') and column not in self._need_cols:
+                    self._need_cols[column] = self._parse_item_column(column, 'NeedResources')
+        
+        # Заполненные колонки наград и ресурсов для каждого экшена:
+        # {action_id: [(колонка, значение, (тип, item_id) или None, ожидаемое количество или None), ...]}
+        self._award_items_per_req = {}
+        self._need_items_per_req = {}
+        for action_id, req in self.requirements_by_action_id.items():
+            self._award_items_per_req[action_id] = self._collect_item_columns(req, self._award_cols)
+            self._need_items_per_req[action_id] = self._collect_item_columns(req, self._need_cols)
 
         # Словарь для быстрого доступа к офферам по ID
         self.offers_by_id = {}
-        if isinstance(self.offers, dict):
-            # Проверяем наличие структуры offers
-            if "offers" in self.offers:
-                # Получаем список офферов из вложенных массивов
-                for offer_group in self.offers["offers"]:
-                    for offer_list in offer_group:
-                        for offer in offer_list:
-                            if isinstance(offer, dict) and "@id" in offer:
-                                self.offers_by_id[offer["@id"]] = offer
-            # А также проверяем наличие структуры prices
-            if "prices" in self.offers:
-                for price in self.offers["prices"]:
-                    if "@id" in price:
-                        self.offers_by_id[price["@id"]] = price
-        
-        # Словарь для хранения всех экшенов из actions.json
-        self.actions_by_id = {}
-        for action in self.actions:
-            action_id = action.get('@id')
-            if action_id:
-                self.actions_by_id[int(action_id)] = action
-        
-        # Получаем список экшенов из промо
+        # Словарь цен по @id (для поиска цены по packet_id оффера)
+        self._prices_by_id = {}
+        try:
+            # Получаем список офферов из вложенных массивов offers (группа -> список -> оффер)
+            flat_offers = chain.from_iterable(chain.from_iterable(self.offers.get("offers", [])))
+            # ID приводятся к int один раз, чтобы Offer ID из требований искался без преобразований;
+            # запись с некорректным @id пропускается, остальные индексируются
+            for offer in flat_offers:
+                if isinstance(offer, dict) and "@id" in offer:
+                    offer_id = self._to_int_id(offer["@id"])
+                    if offer_id is None:
+                        self.log_warning(f"Некорректный @id оффера в offers.json: {offer['@id']}")
+                        continue
+                    self.offers_by_id[offer_id] = offer
+            # А также добавляем структуру prices
+            for price in self.offers.get("prices", []):
+                if isinstance(price, dict) and "@id" in price:
+                    # Цены ищутся по packet_id без приведения к int
+                    self._prices_by_id.setdefault(price["@id"], price)
+                    price_id = self._to_int_id(price["@id"])
+                    if price_id is None:
+                        self.log_warning(f"Некорректный @id цены в offers.json: {price['@id']}")
+                        continue
+                    self.offers_by_id[price_id] = price
+        except (AttributeError, KeyError, TypeError) as e:
+            # Структура offers.json не соответствует ожидаемой - сообщаем, иначе все офферы будут "отсутствующими"
+            self.log_error(f"Некорректная структура offers.json, офферы не загружены: {str(e)}")
+            self.offers_by_id = {}
+            self._prices_by_id = {}
+        
+        # Словарь для хранения всех экшенов из actions.json (ключи - int)
+        self.actions_by_id = {int(action['@id']): action for action in self.actions if action.get('@id')}
+        
+        # Получаем список экшенов из промо (ID приводятся к int, как и ключи requirements_by_action_id)
         self.promo_action_ids = set()
         if isinstance(self.promo, dict) and "awards" in self.promo:
-            self.promo_action_ids = set(self.promo.get('awards', []))
+            for award_id in self.promo.get('awards', []):
+                award_id = self._to_int_id(award_id)
+                if award_id is not None:
+                    self.promo_action_ids.add(award_id)
         
         self.log_info(f"Загружено {len(self.requirements_by_action_id)} записей из таблицы требований")
         self.log_info(f"Загружено {len(self.actions_by_id)} записей из файла экшенов")
@@ -121,10 +221,12 @@ class ShopOffersValidator:
     def _load_json(self, file_path):
         """Загрузка JSON-файла"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                self.log_info(f"✓ JSON-файл {file_path} успешно загружен")
-                return data
+            # Файл читается целиком одним вызовом и разбирается из байтов
+            with open(file_path, 'rb') as f:
+                raw = f.read()
+            data = orjson.loads(raw) if orjson is not None else json.loads(raw)
+            self.log_info(f"✓ JSON-файл {file_path} успешно загружен")
+            return data
         except Exception as e:
             error_msg = f"Ошибка при загрузке JSON-файла {file_path}: {str(e)}"
             self.log_error(error_msg)
@@ -135,9 +237,11 @@ class ShopOffersValidator:
         try:
             data = []
             with open(file_path, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    data.append(row)
+                reader = csv.reader(f)
+                headers = next(reader, None)
+                if headers is not None:
+                    # Заголовок читается один раз, строки собираются в словари без обвязки DictReader
+                    data = [dict(zip(headers, row)) for row in reader if row]
             self.log_info(f"✓ CSV-файл {file_path} успешно загружен")
             return data
         except Exception as e:
@@ -145,11 +249,50 @@ class ShopOffersValidator:
             self.log_error(error_msg)
             return []
     
+    def _to_int_id(self, value):
+        """Приведение ID (int или строка с числом) к int; для остальных значений возвращается None"""
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+        if isinstance(value, str):
+            try:
+                return int(value)
+            except ValueError:
+                return None
+        return None
+    
+    def _parse_item_column(self, column, prefix):
+        """Разбор названия колонки вида Award_points(17909) или NeedResources(17907) в (тип, item_id)"""
+        parts = column.split('(')
+        if len(parts) != 2:
+            return None
+        
+        item_type = parts[0].removeprefix(prefix)
+        try:
+            item_id = int(parts[1].removesuffix(')'))
+        except (ValueError, TypeError):
+            item_id = None
+        return item_type, item_id
+    
+    def _collect_item_columns(self, req, columns):
+        """Выбор заполненных колонок наград/ресурсов из строки требований с разбором ожидаемого количества"""
+        items = []
+        for column, column_spec in columns.items():
+            value = req.get(column)
+            if not value:
+                continue
+            
+            try:
+                expected_count = int(value)
+            except (ValueError, TypeError):
+                expected_count = None
+            items.append((column, value, column_spec, expected_count))
+        return items
+    
     def print_header(self, text):
         """Печать заголовка с форматированием"""
         # Добавляем заголовок в лог
-        log_entry = f"\n{'=' * 80}\n{text}\n{'=' * 80}"
-        self.info_logs.append(log_entry)
+        if self._retain_logs:
+            self._add_log((None, None, None, f"\n{'=' * 80}\n{text}\n{'=' * 80}"))
         
         if self.json_output:
             return
@@ -160,16 +303,19 @@ class ShopOffersValidator:
     
     def log_info(self, message):
         """Логирование информационных сообщений"""
-        timestamp = datetime.now().strftime('%H:%M:%S')
-        log_entry = f"[INFO] {timestamp} - {message}"
-        self.info_logs.append(log_entry)
+        if self._retain_logs:
+            self._add_log((time.time(), "INFO", None, message))
         if self.verbose and not self.json_output:
-            print(f"{self.BLUE}[ИНФО]{self.RESET} {message}")
+            sys.stdout.write(self._info_prefix + message + "\n")
+    
+    def _log_info_lazy(self, fmt, *args):
+        """Логирование информационного сообщения, которое форматируется только если оно будет использовано"""
+        if self._retain_logs or (self.verbose and not self.json_output):
+            self.log_info(fmt % args)
             
     def log_check(self, action_id, check_name, result, expected=None, actual=None, details=None, check_tag=None):
         """Логирование результата проверки"""
         self.stats["total_checks"] += 1
-        timestamp = datetime.now().strftime('%H:%M:%S')
         
         # Формируем дополнительную информацию для лога
         extra_info = ""
@@ -178,25 +324,13 @@ class ShopOffersValidator:
         
         if result:
             self.stats["passed_checks"] += 1
-            status = f"{self.GREEN}✓ УСПЕХ{self.RESET}"
-            log_msg = f"[CHECK:OK] {timestamp} - Action {action_id}: {check_name}{extra_info}"
+            log_level = "CHECK:OK"
         else:
             self.stats["failed_checks"] += 1
-            status = f"{self.RED}✗ ОШИБКА{self.RESET}"
-            log_msg = f"[CHECK:FAIL] {timestamp} - Action {action_id}: {check_name}{extra_info}"
+            log_level = "CHECK:FAIL"
             
             # Добавляем ошибку в список ошибок для этого action_id
-            if action_id not in self.offer_errors:
-                self.offer_errors[action_id] = []
-            
-            error_details = {
-                "check": check_name,
-                "expected": expected,
-                "actual": actual,
-                "details": details,
-                "tag": check_tag
-            }
-            self.offer_errors[action_id].append(error_details)
+            self.offer_errors[action_id].append(ErrorRecord(check_name, expected, actual, details, check_tag))
             
             # Добавляем в общий список ошибок
             error_msg = f"Action {action_id}: {check_name}"
@@ -206,71 +340,59 @@ class ShopOffersValidator:
                 error_msg += f" - {details}"
             self.errors.append(error_msg)
         
-        self.info_logs.append(log_msg)
+        if self._retain_logs:
+            self._add_log((time.time(), log_level, action_id, f"{check_name}{extra_info}"))
         
         if self.verbose and not self.json_output:
-            print(f"{status} Action {action_id}: {check_name}{extra_info}")
+            status = self._check_ok if result else self._check_fail
+            sys.stdout.write(f"{status}{action_id}: {check_name}{extra_info}\n")
             if details and not result:
                 print(f"  {details}")
     
     def log_warning(self, message, action_id=None):
         """Логирование предупреждений"""
         self.stats["warning_checks"] += 1
-        timestamp = datetime.now().strftime('%H:%M:%S')
         
         if action_id is not None:
-            log_msg = f"[WARNING] {timestamp} - Action {action_id}: {message}"
-            display_msg = f"{self.YELLOW}[ВНИМАНИЕ]{self.RESET} Action {action_id}: {message}"
-            
             # Добавляем предупреждение в список для этого action_id
-            if action_id not in self.offer_errors:
-                self.offer_errors[action_id] = []
-            
-            self.offer_errors[action_id].append({
-                "check": "warning",
-                "expected": None,
-                "actual": None,
-                "details": message,
-                "tag": "WARNING"
-            })
-        else:
-            log_msg = f"[WARNING] {timestamp} - {message}"
-            display_msg = f"{self.YELLOW}[ВНИМАНИЕ]{self.RESET} {message}"
+            self.offer_errors[action_id].append(ErrorRecord("warning", None, None, message, "WARNING"))
         
-        self.info_logs.append(log_msg)
+        if self._retain_logs:
+            self._add_log((time.time(), "WARNING", action_id, message))
         self.warnings.append(message)
         
         if self.verbose and not self.json_output:
-            print(display_msg)
+            target = f"Action {action_id}: " if action_id is not None else ""
+            sys.stdout.write(self._warning_prefix + target + message + "\n")
     
     def log_error(self, message, action_id=None):
         """Логирование ошибок"""
-        timestamp = datetime.now().strftime('%H:%M:%S')
-        
         if action_id is not None:
-            log_msg = f"[ERROR] {timestamp} - Action {action_id}: {message}"
-            display_msg = f"{self.RED}[ОШИБКА]{self.RESET} Action {action_id}: {message}"
-            
             # Добавляем ошибку в список для этого action_id
-            if action_id not in self.offer_errors:
-                self.offer_errors[action_id] = []
-            
-            self.offer_errors[action_id].append({
-                "check": "error",
-                "expected": None,
-                "actual": None,
-                "details": message,
-                "tag": "ERROR"
-            })
-        else:
-            log_msg = f"[ERROR] {timestamp} - {message}"
-            display_msg = f"{self.RED}[ОШИБКА]{self.RESET} {message}"
+            self.offer_errors[action_id].append(ErrorRecord("error", None, None, message, "ERROR"))
         
-        self.info_logs.append(log_msg)
+        if self._retain_logs:
+            self._add_log((time.time(), "ERROR", action_id, message))
         self.errors.append(message)
         
         if self.verbose and not self.json_output:
-            print(display_msg)
+            target = f"Action {action_id}: " if action_id is not None else ""
+            sys.stdout.write(self._error_prefix + target + message + "\n")
+    
+    def _write_log(self, entry):
+        """Запись строки лога в открытый файл подробного лога"""
+        self._log_fp.write(self._format_log(entry) + "\n")
+    
+    def _format_log(self, entry):
+        """Форматирование записи лога в строку"""
+        ts, level, action_id, message = entry
+        if level is None:
+            return message
+        
+        timestamp = time.strftime('%H:%M:%S', time.localtime(ts))
+        if action_id is not None:
+            return f"[{level}] {timestamp} - Action {action_id}: {message}"
+        return f"[{level}] {timestamp} - {message}"
     
     def start_phase(self, phase_name):
         """Начало новой фазы проверки"""
@@ -325,38 +447,33 @@ class ShopOffersValidator:
                 continue
             
             action = self.actions_by_id[action_id]
-            awards = action.get('awards', [])
+            
+            # Индексы наград и необходимых ресурсов типа "item" по itemId (первое вхождение)
+            awards_idx = {}
+            for award in action.get('awards', []):
+                if award.get('type') == 'item':
+                    awards_idx.setdefault(award.get('itemId'), award.get('count', 0))
+            
+            need_resources_idx = {}
+            for resource in action.get('needResources', []):
+                if resource.get('type') == 'item':
+                    need_resources_idx.setdefault(resource.get('itemId'), resource.get('count', 0))
             
             # Проверяем каждую награду из требований
-            for column, value in req.items():
-                if not value or not column.startswith('Award_'):
-                    continue
-                
-                # Извлекаем item_id и ожидаемое количество из столбца
-                # Формат столбца: Award_points(17909) или Award_techitem(17907)
-                parts = column.split('(')
-                if len(parts) != 2:
+            # Формат столбца: Award_points(17909) или Award_techitem(17907), разобран при загрузке
+            for column, value, column_spec, expected_count in self._award_items_per_req[action_id]:
+                if column_spec is None:
                     self.log_warning(f"Неправильный формат столбца награды: {column}", action_id)
                     continue
                 
-                item_type = parts[0].replace('Award_', '')
-                item_id_str = parts[1].replace(')', '')
-                try:
-                    item_id = int(item_id_str)
-                    expected_count = int(value)
-                except (ValueError, TypeError):
+                item_type, item_id = column_spec
+                if item_id is None or expected_count is None:
                     self.log_warning(f"Неправильное значение награды: {value} для {column}", action_id)
                     continue
                 
                 # Ищем соответствующую награду в экшене
-                found = False
-                actual_count = 0
-                
-                for award in awards:
-                    if award.get('type') == 'item' and award.get('itemId') == item_id:
-                        found = True
-                        actual_count = award.get('count', 0)
-                        break
+                found = item_id in awards_idx
+                actual_count = awards_idx[item_id] if found else 0
                 
                 self.log_check(
                     action_id,
@@ -369,36 +486,20 @@ class ShopOffersValidator:
                 )
             
             # Проверка необходимых ресурсов (needResources)
-            need_resources = action.get('needResources', [])
-            
-            for column, value in req.items():
-                if not value or not column.startswith('NeedResources'):
-                    continue
-                
-                # Извлекаем item_id и ожидаемое количество из столбца
-                # Формат столбца: NeedResources(17907)
-                parts = column.split('(')
-                if len(parts) != 2:
+            # Формат столбца: NeedResources(17907), разобран при загрузке
+            for column, value, column_spec, expected_count in self._need_items_per_req[action_id]:
+                if column_spec is None:
                     self.log_warning(f"Неправильный формат столбца ресурсов: {column}", action_id)
                     continue
                 
-                item_id_str = parts[1].replace(')', '')
-                try:
-                    item_id = int(item_id_str)
-                    expected_count = int(value)
-                except (ValueError, TypeError):
+                item_id = column_spec[1]
+                if item_id is None or expected_count is None:
                     self.log_warning(f"Неправильное значение ресурса: {value} для {column}", action_id)
                     continue
                 
                 # Ищем соответствующий ресурс в экшене
-                found = False
-                actual_count = 0
-                
-                for resource in need_resources:
-                    if resource.get('type') == 'item' and resource.get('itemId') == item_id:
-                        found = True
-                        actual_count = resource.get('count', 0)
-                        break
+                found = item_id in need_resources_idx
+                actual_count = need_resources_idx[item_id] if found else 0
                 
                 self.log_check(
                     action_id,
@@ -450,7 +551,7 @@ class ShopOffersValidator:
                     # Проверяем наличие actionId в параметрах оффера
                     if "actionId" in offer_params:
                         actual_action_id = offer_params["actionId"]
-                        is_match = str(actual_action_id) == str(expected_action_id)
+                        is_match = self._to_int_id(actual_action_id) == expected_action_id
                         
                         self.log_check(
                             action_id, 
@@ -483,8 +584,7 @@ class ShopOffersValidator:
                     )
             else:
                 # Проверяем, является ли этот алиас особым случаем, для которого не нужно проверять наличие в awards
-                special_config = self.special_aliases.get(alias)
-                if special_config and special_config.get("skip_promo_check"):
+                if alias in self._skip_promo_aliases:
                     self.log_info(f"Пропуск проверки наличия в awards для {alias} (Action {action_id})")
                     continue
                 
@@ -509,8 +609,7 @@ class ShopOffersValidator:
             alias = req.get('alias', 'Неизвестно')
             
             # Проверяем, является ли этот алиас особым случаем, для которого не нужно проверять offer
-            special_config = self.special_aliases.get(alias)
-            if special_config and special_config.get("skip_offer_check"):
+            if alias in self._skip_offer_aliases:
                 self.log_info(f"Пропуск проверки Offer для {alias} (Action {action_id})")
                 continue
             
@@ -599,15 +698,9 @@ class ShopOffersValidator:
                     packet_id = offer.get('packet_id')
                     
                     # Ищем цену в массиве prices по packet_id
-                    price_found = False
-                    actual_price = None
-                    
-                    if isinstance(self.offers, dict) and "prices" in self.offers:
-                        for price in self.offers["prices"]:
-                            if price.get('@id') == packet_id:
-                                actual_price = price.get('USD')
-                                price_found = True
-                                break
+                    price = self._prices_by_id.get(packet_id)
+                    price_found = price is not None
+                    actual_price = price.get('USD') if price_found else None
                     
                     if price_found and actual_price is not None:
                         actual_price_float = float(actual_price)
@@ -700,54 +793,130 @@ class ShopOffersValidator:
                 print(f"{i}. {error}")
     
     def save_report_to_csv(self, output_file="validation_report.csv"):
-        """Сохранение отчета в CSV-файл"""
+        """Сохранение отчета в CSV-файл (при json_output - в JSON-файл)"""
+        if self.json_output:
+            self._save_report_to_json(output_file)
+            return
+        
         try:
-            with open(output_file, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow(["Action ID", "Проверка", "Результат", "Ожидаемое", "Фактическое", "Детали"])
-                
-                for action_id, errors in self.offer_errors.items():
-                    for error in errors:
-                        writer.writerow([
-                            action_id,
-                            error.get("check", ""),
-                            "ОШИБКА" if error.get("tag") != "WARNING" else "ПРЕДУПРЕЖДЕНИЕ",
-                            error.get("expected", ""),
-                            error.get("actual", ""),
-                            error.get("details", "")
-                        ])
+            with open(output_file, 'w', newline='', encoding='utf-8', buffering=1024 * 1024) as f:
+                # Строки формируются вручную: разделитель и окончание строк как у csv.writer
+                f.write("Action ID,Проверка,Результат,Ожидаемое,Фактическое,Детали\r\n")
+                f.writelines(
+                    f"{_csv_field(action_id)},{_csv_field(error.check)},"
+                    f"{'ОШИБКА' if error.tag != 'WARNING' else 'ПРЕДУПРЕЖДЕНИЕ'},"
+                    f"{_csv_field(error.expected)},{_csv_field(error.actual)},{_csv_field(error.details)}\r\n"
+                    for action_id, errors in self.offer_errors.items()
+                    for error in errors
+                )
                         
-            self.log_info(f"Отчет сохранен в файл: {output_file}")
+            self._log_info_lazy("Отчет сохранен в файл: %s", output_file)
         except Exception as e:
             self.log_error(f"Ошибка при сохранении отчета: {str(e)}")
     
-    def save_detailed_log(self, output_file="validation_detailed.log"):
-        """Сохранение подробного лога в файл"""
+    def _save_report_to_json(self, output_file):
+        """Сохранение отчета в JSON-файл: список записей с теми же полями, что и в CSV"""
         try:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                for line in self.info_logs:
-                    # Удаление ANSI-кодов цветов
-                    clean_line = line
-                    for color_code in [self.GREEN, self.RED, self.YELLOW, self.BLUE, 
-                                      self.MAGENTA, self.CYAN, self.BOLD, self.UNDERLINE, self.RESET]:
-                        clean_line = clean_line.replace(color_code, "")
-                    f.write(clean_line + "\n")
-            self.log_info(f"Подробный лог сохранен в файл: {output_file}")
+            records = [
+                {
+                    "action_id": action_id,
+                    "check": error.check,
+                    "result": "ОШИБКА" if error.tag != "WARNING" else "ПРЕДУПРЕЖДЕНИЕ",
+                    "expected": error.expected,
+                    "actual": error.actual,
+                    "details": error.details
+                }
+                for action_id, errors in self.offer_errors.items()
+                for error in errors
+            ]
+            if orjson is not None:
+                payload = orjson.dumps(records, default=str, option=orjson.OPT_APPEND_NEWLINE)
+            else:
+                payload = (json.dumps(records, ensure_ascii=False, default=str) + "\n").encode('utf-8')
+            with open(output_file, 'wb') as f:
+                f.write(payload)
+            self._log_info_lazy("Отчет сохранен в файл: %s", output_file)
+        except Exception as e:
+            self.log_error(f"Ошибка при сохранении отчета: {str(e)}")
+    
+    def save_detailed_log(self, output_file=None):
+        """
+        Сохранение подробного лога в файл.
+        
+        При потоковой записи (указан log_file) лог уже находится в log_file и здесь только закрывается;
+        output_file в этом случае не используется, и если он отличается от log_file, выводится предупреждение.
+        Без потоковой записи лог сохраняется в output_file (по умолчанию validation_detailed.log).
+        """
+        if self._log_fp is not None:
+            # Лог уже записан по ходу проверки - остается закрыть файл
+            if output_file is not None and os.path.abspath(output_file) != os.path.abspath(self._log_fp.name):
+                self.log_warning(
+                    f"Подробный лог записывается в {self._log_fp.name}, путь {output_file} не используется"
+                )
+            log_fp, self._log_fp = self._log_fp, None
+            self._add_log = self.info_logs.append
+            try:
+                log_fp.close()
+                self._log_info_lazy("Подробный лог сохранен в файл: %s", log_fp.name)
+            except Exception as e:
+                self.log_error(f"Ошибка при сохранении лога: {str(e)}")
+            return
+        
+        if output_file is None:
+            output_file = "validation_detailed.log"
+        
+        try:
+            payload = b""
+            if self.info_logs:
+                payload = ("\n".join([self._format_log(entry) for entry in self.info_logs]) + "\n").encode('utf-8')
+            # Весь лог уже собран в байты - пишем напрямую в дескриптор, без текстовой обертки файла
+            fd = os.open(output_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                view = memoryview(payload)
+                while view:
+                    view = view[os.write(fd, view):]
+            finally:
+                os.close(fd)
+            self._log_info_lazy("Подробный лог сохранен в файл: %s", output_file)
         except Exception as e:
             self.log_error(f"Ошибка при сохранении лога: {str(e)}")
 
-def main():
+# Значения аргументов командной строки по умолчанию
+_CLI_DEFAULTS = {
+    "promo": "promo.json",
+    "requirements": "requirements.csv",
+    "actions": "actions.json",
+    "offers": "offers.json",
+    "report": None,
+    "log": "validation_detailed.log",
+    "no_log": False,
+    "quiet": False,
+    "json": False
+}
+
+def parse_args():
+    """Разбор аргументов командной строки"""
+    # Без аргументов разбирать нечего - argparse даже не импортируется
+    if len(sys.argv) == 1:
+        return SimpleNamespace(**_CLI_DEFAULTS)
+    
+    import argparse
     parser = argparse.ArgumentParser(description='Валидатор офферов магазина')
-    parser.add_argument('--promo', default="promo.json", help='Путь к файлу promo.json')
-    parser.add_argument('--requirements', default="requirements.csv", help='Путь к файлу requirements.csv')
-    parser.add_argument('--actions', default="actions.json", help='Путь к файлу actions.json')
-    parser.add_argument('--offers', default="offers.json", help='Путь к файлу offers.json')
-    parser.add_argument('--report', default="validation_report.csv", help='Путь к файлу отчета')
-    parser.add_argument('--log', default="validation_detailed.log", help='Путь к файлу лога')
+    parser.add_argument('--promo', help='Путь к файлу promo.json')
+    parser.add_argument('--requirements', help='Путь к файлу requirements.csv')
+    parser.add_argument('--actions', help='Путь к файлу actions.json')
+    parser.add_argument('--offers', help='Путь к файлу offers.json')
+    parser.add_argument('--report',
+                        help='Путь к файлу отчета (по умолчанию validation_report.csv, с --json - validation_report.json)')
+    parser.add_argument('--log', help='Путь к файлу лога')
+    parser.add_argument('--no-log', action='store_true', help='Не сохранять подробный лог')
     parser.add_argument('--quiet', action='store_true', help='Минимальный вывод в консоль')
     parser.add_argument('--json', action='store_true', help='Вывод в формате JSON')
-    
-    args = parser.parse_args()
+    parser.set_defaults(**_CLI_DEFAULTS)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
     
     validator = ShopOffersValidator(
         promo_file=args.promo,
@@ -755,12 +924,16 @@ def main():
         actions_file=args.actions,
         offers_file=args.offers,
         verbose=not args.quiet,
-        json_output=args.json
+        json_output=args.json,
+        retain_logs=not args.no_log,
+        log_file=args.log
     )
     
     validator.validate_all()
-    validator.save_report_to_csv(args.report)
-    validator.save_detailed_log(args.log)
+    report_file = args.report or ("validation_report.json" if args.json else "validation_report.csv")
+    validator.save_report_to_csv(report_file)
+    if not args.no_log:
+        validator.save_detailed_log(args.log)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file